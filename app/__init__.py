@@ -1,3 +1,73 @@
 """
-Flask application package.
+Flask application package and factory.
 """
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from flask_jwt_extended import JWTManager
+from flask_cors import CORS
+from flask_mail import Mail
+from flask_caching import Cache
+from config import config
+import os
+from datetime import timedelta
+
+# Initialize extensions
+db = SQLAlchemy()
+migrate = Migrate()
+jwt = JWTManager()
+mail = Mail()
+cache = Cache()
+
+def create_app(config_name=None):
+    """Application factory pattern."""
+    app = Flask(__name__)
+    
+    # Load configuration ('development', 'testing', 'production', 'docker')
+    app_config = config[config_name or 'default']
+    app.config.from_object(app_config)
+    app_config.init_app(app)
+    
+    # Initialize extensions with app
+    db.init_app(app)
+    migrate.init_app(app, db)
+    jwt.init_app(app)
+    mail.init_app(app)
+    cache.init_app(app)
+    CORS(app)
+    
+    # Serialize JSON responses with orjson
+    from app.utils import OrjsonProvider
+    app.json = OrjsonProvider(app)
+    
+    # Configure JWT
+    app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'your-secret-key')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+    app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
+    
+    # Register blueprints
+    from app.auth import auth_bp
+    from app.api import api_bp
+    from app.main import main_bp
+    
+    app.register_blueprint(main_bp)
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+    
+    @app.cli.command('recount-comments')
+    def recount_comments():
+        """Backfill Post.comment_count from the approved comments."""
+        from app.models import recount_comment_counts
+        recount_comment_counts()
+    
+    # Error handlers
+    @app.errorhandler(404)
+    def not_found(error):
+        return {'error': 'Not found'}, 404
+    
+    @app.errorhandler(500)
+    def internal_error(error):
+        db.session.rollback()
+        return {'error': 'Internal server error'}, 500
+    
+    return app
@@ -1,39 +1,87 @@
 """
 API routes for CRUD operations.
 """
-from flask import request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import request, jsonify, abort
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 from app.api import api_bp
 from app.models import Post, Tag, Comment, User
-from app import db
+from app import db, cache
+from app.utils import all_tags, current_user
 from datetime import datetime
+from functools import wraps
+import base64
+import json
+import re
+import secrets
 import uuid
 
+_SLUG_STRIP = re.compile(r'[^\w-]+')
+
 def admin_required(f):
-    """Decorator to require admin privileges."""
-    from functools import wraps
-    from flask_jwt_extended import jwt_required, get_jwt_identity
-    
+    """Decorator to require admin privileges (read from the token's 'adm' claim)."""
     @wraps(f)
     @jwt_required()
     def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        if not user or not user.is_admin:
+        if not get_jwt().get('adm'):
             return jsonify({'error': 'Admin privileges required'}), 403
         return f(*args, **kwargs)
     return decorated_function
 
+def slugify(text):
+    """Convert text into a lowercase, hyphen-separated slug, keeping non-ASCII letters."""
+    slug = text.lower().replace(' ', '-').replace('_', '-')
+    # Text with no letters or digits at all still needs a usable slug
+    return _SLUG_STRIP.sub('', slug).strip('-') or secrets.token_hex(4)
+
+def encode_cursor(row):
+    """Encode a row's (created_at, id) position as an opaque pagination cursor."""
+    payload = json.dumps([row.created_at.isoformat(), str(row.id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor):
+    """Decode a pagination cursor into a (created_at, id) tuple; raises ValueError if malformed."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (TypeError, AttributeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def paginate_by_cursor(query, model, cursor, per_page):
+    """Return one newest-first keyset page of query and the cursor for the next page."""
+    per_page = max(per_page, 1)
+    if cursor:
+        query = query.filter(tuple_(model.created_at, model.id) < decode_cursor(cursor))
+    
+    items = query.order_by(model.created_at.desc(), model.id.desc())\
+        .limit(per_page + 1)\
+        .all()
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return items[:per_page], next_cursor
+
+def commit_with_unique_slug(obj):
+    """Insert obj optimistically, retrying once with a random slug suffix on conflict."""
+    db.session.add(obj)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        obj.slug = f"{obj.slug}-{secrets.token_hex(3)}"
+        db.session.add(obj)
+        db.session.commit()
+
 # Post management routes
 @api_bp.route('/posts', methods=['GET'])
 def get_posts():
-    """Get all posts with pagination and filtering."""
-    page = request.args.get('page', 1, type=int)
+    """Get all posts with cursor pagination and filtering."""
+    cursor = request.args.get('cursor')
     per_page = request.args.get('per_page', 10, type=int)
     published_only = request.args.get('published_only', 'true').lower() == 'true'
     tag_slug = request.args.get('tag')
     
-    query = Post.query
+    query = Post.query.options(joinedload(Post.author), selectinload(Post.tags))
     
     if published_only:
         query = query.filter_by(is_published=True)
@@ -43,14 +91,14 @@ def get_posts():
         if tag:
             query = query.filter(Post.tags.contains(tag))
     
-    posts = query.order_by(Post.created_at.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        posts, next_cursor = paginate_by_cursor(query, Post, cursor, per_page)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
-        'posts': [post.to_dict() for post in posts.items],
-        'total': posts.total,
-        'pages': posts.pages,
-        'current_page': page
+        'posts': [post.to_dict() for post in posts],
+        'next_cursor': next_cursor
     })
 
 @api_bp.route('/posts', methods=['POST'])
@@ -69,15 +117,7 @@ def create_post():
             return jsonify({'error': f'{field} is required'}), 400
     
     # Generate slug from title
-    slug = data.get('slug') or data['title'].lower().replace(' ', '-').replace('_', '-')
-    slug = ''.join(c for c in slug if c.isalnum() or c in '-').strip('-')
-    
-    # Ensure slug is unique
-    original_slug = slug
-    counter = 1
-    while Post.query.filter_by(slug=slug).first():
-        slug = f"{original_slug}-{counter}"
-        counter += 1
+    slug = slugify(data.get('slug') or data['title'])
     
     post = Post(
         title=data['title'],
@@ -85,15 +125,14 @@ def create_post():
         excerpt=data.get('excerpt', ''),
         slug=slug,
         is_published=data.get('is_published', False),
-        user_id=current_user_id
+        user_id=uuid.UUID(current_user_id)
     )
     
     if post.is_published:
         post.published_at = datetime.utcnow()
     
     try:
-        db.session.add(post)
-        db.session.commit()
+        commit_with_unique_slug(post)
         
         return jsonify({
             'message': 'Post created successfully',
@@ -104,22 +143,21 @@ def create_post():
         db.session.rollback()
         return jsonify({'error': 'Failed to create post'}), 500
 
-@api_bp.route('/posts/<post_id>', methods=['GET'])
+@api_bp.route('/posts/<uuid:post_id>', methods=['GET'])
 def get_post(post_id):
     """Get a specific post."""
-    post = Post.query.get_or_404(post_id)
+    post = db.get_or_404(Post, post_id)
     return jsonify(post.to_dict())
 
-@api_bp.route('/posts/<post_id>', methods=['PUT'])
+@api_bp.route('/posts/<uuid:post_id>', methods=['PUT'])
 @jwt_required()
 def update_post(post_id):
     """Update a post."""
-    current_user_id = get_jwt_identity()
-    post = Post.query.get_or_404(post_id)
+    post = db.get_or_404(Post, post_id)
     
     # Check if user owns the post or is admin
-    user = User.query.get(current_user_id)
-    if post.user_id != current_user_id and not user.is_admin:
+    user = current_user()
+    if post.user_id != user.id and not user.is_admin:
         return jsonify({'error': 'Permission denied'}), 403
     
     data = request.get_json()
@@ -138,8 +176,6 @@ def update_post(post_id):
         if data['is_published'] and not post.published_at:
             post.published_at = datetime.utcnow()
     
-    post.updated_at = datetime.utcnow()
-    
     try:
         db.session.commit()
         return jsonify({
@@ -150,16 +186,15 @@ def update_post(post_id):
         db.session.rollback()
         return jsonify({'error': 'Failed to update post'}), 500
 
-@api_bp.route('/posts/<post_id>', methods=['DELETE'])
+@api_bp.route('/posts/<uuid:post_id>', methods=['DELETE'])
 @jwt_required()
 def delete_post(post_id):
     """Delete a post."""
-    current_user_id = get_jwt_identity()
-    post = Post.query.get_or_404(post_id)
+    post = db.get_or_404(Post, post_id)
     
     # Check if user owns the post or is admin
-    user = User.query.get(current_user_id)
-    if post.user_id != current_user_id and not user.is_admin:
+    user = current_user()
+    if post.user_id != user.id and not user.is_admin:
         return jsonify({'error': 'Permission denied'}), 403
     
     try:
@@ -174,8 +209,9 @@ def delete_post(post_id):
 @api_bp.route('/tags', methods=['GET'])
 def get_tags():
     """Get all tags."""
-    tags = Tag.query.all()
-    return jsonify([tag.to_dict() for tag in tags])
+    response = jsonify(all_tags())
+    response.add_etag()
+    return response.make_conditional(request)
 
 @api_bp.route('/tags', methods=['POST'])
 @jwt_required()
@@ -191,8 +227,7 @@ def create_tag():
         return jsonify({'error': 'Tag already exists'}), 400
     
     # Generate slug from name
-    slug = data.get('slug') or data['name'].lower().replace(' ', '-').replace('_', '-')
-    slug = ''.join(c for c in slug if c.isalnum() or c in '-').strip('-')
+    slug = slugify(data.get('slug') or data['name'])
     
     tag = Tag(
         name=data['name'],
@@ -201,8 +236,8 @@ def create_tag():
     )
     
     try:
-        db.session.add(tag)
-        db.session.commit()
+        commit_with_unique_slug(tag)
+        cache.delete_memoized(all_tags)
         
         return jsonify({
             'message': 'Tag created successfully',
@@ -214,17 +249,19 @@ def create_tag():
         return jsonify({'error': 'Failed to create tag'}), 500
 
 # Comment management routes
-@api_bp.route('/posts/<post_id>/comments', methods=['GET'])
+@api_bp.route('/posts/<uuid:post_id>/comments', methods=['GET'])
 def get_post_comments(post_id):
     """Get comments for a post."""
-    post = Post.query.get_or_404(post_id)
     comments = Comment.query.filter_by(post_id=post_id, is_approved=True).all()
+    # Only check that the post exists when there is nothing to return
+    if not comments and not db.session.query(Post.query.filter_by(id=post_id).exists()).scalar():
+        abort(404)
     return jsonify([comment.to_dict() for comment in comments])
 
-@api_bp.route('/posts/<post_id>/comments', methods=['POST'])
+@api_bp.route('/posts/<uuid:post_id>/comments', methods=['POST'])
 def create_comment(post_id):
     """Create a comment for a post."""
-    post = Post.query.get_or_404(post_id)
+    post = db.get_or_404(Post, post_id)
     data = request.get_json()
     
     if not data or 'content' not in data:
@@ -239,10 +276,9 @@ def create_comment(post_id):
     
     # If user is logged in, associate with user
     try:
-        from flask_jwt_extended import get_jwt_identity
         current_user_id = get_jwt_identity()
         if current_user_id:
-            comment.user_id = current_user_id
+            comment.user_id = uuid.UUID(current_user_id)
     except:
         pass  # User not logged in, anonymous comment
     
@@ -264,23 +300,24 @@ def create_comment(post_id):
 @admin_required
 def get_all_users():
     """Get all users (admin only)."""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = request.args.get('per_page', 20, type=int)
     
-    users = User.query.paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        users, next_cursor = paginate_by_cursor(User.query, User, cursor, per_page)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
-        'users': [user.to_dict() for user in users.items],
-        'total': users.total,
-        'pages': users.pages,
-        'current_page': page
+        'users': [user.to_dict() for user in users],
+        'next_cursor': next_cursor
     })
 
 @api_bp.route('/admin/comments', methods=['GET'])
 @admin_required
 def get_all_comments():
     """Get all comments for moderation (admin only)."""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = request.args.get('per_page', 20, type=int)
     approved_only = request.args.get('approved_only', 'false').lower() == 'true'
     
@@ -288,21 +325,21 @@ def get_all_comments():
     if approved_only:
         query = query.filter_by(is_approved=True)
     
-    comments = query.order_by(Comment.created_at.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        comments, next_cursor = paginate_by_cursor(query, Comment, cursor, per_page)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
-        'comments': [comment.to_dict() for comment in comments.items],
-        'total': comments.total,
-        'pages': comments.pages,
-        'current_page': page
+        'comments': [comment.to_dict() for comment in comments],
+        'next_cursor': next_cursor
     })
 
-@api_bp.route('/admin/comments/<comment_id>/approve', methods=['POST'])
+@api_bp.route('/admin/comments/<uuid:comment_id>/approve', methods=['POST'])
 @admin_required
 def approve_comment(comment_id):
     """Approve a comment (admin only)."""
-    comment = Comment.query.get_or_404(comment_id)
+    comment = db.get_or_404(Comment, comment_id)
     comment.is_approved = True
     
     try:
@@ -6,19 +6,47 @@ from flask_jwt_extended import (
     create_access_token, 
     create_refresh_token, 
     jwt_required, 
-    get_jwt_identity,
-    get_jwt
+    get_jwt_identity
 )
 from app.auth import auth_bp
 from app.models import User
 from app import db
+from app.utils import current_user
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from sqlalchemy import update
 import re
 
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Background writers for bookkeeping that should not delay the response
+_executor = ThreadPoolExecutor(max_workers=4)
+
 def validate_email(email):
     """Validate email format."""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
+
+def _record_last_login(app, user_id, timestamp):
+    """Persist a user's last_login timestamp in its own app context."""
+    with app.app_context():
+        try:
+            db.session.execute(
+                update(User).where(User.id == user_id).values(last_login=timestamp)
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            app.logger.exception('Failed to record last_login for user %s', user_id)
+
+def record_last_login(user):
+    """Update user's last_login, off the request thread when DEFER_LAST_LOGIN is set."""
+    timestamp = datetime.utcnow()
+    user.last_login = timestamp
+    app = current_app._get_current_object()
+    if app.config['DEFER_LAST_LOGIN']:
+        _executor.submit(_record_last_login, app, user.id, timestamp)
+    else:
+        _record_last_login(app, user.id, timestamp)
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -59,8 +87,8 @@ def register():
         db.session.commit()
         
         # Create tokens
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
+        access_token = create_access_token(identity=str(user.id), additional_claims={'adm': user.is_admin})
+        refresh_token = create_refresh_token(identity=str(user.id))
         
         return jsonify({
             'message': 'User registered successfully',
@@ -99,12 +127,11 @@ def login():
         return jsonify({'error': 'Account is deactivated'}), 401
     
     # Update last login
-    user.last_login = datetime.utcnow()
-    db.session.commit()
+    record_last_login(user)
     
     # Create tokens
-    access_token = create_access_token(identity=user.id)
-    refresh_token = create_refresh_token(identity=user.id)
+    access_token = create_access_token(identity=str(user.id), additional_claims={'adm': user.is_admin})
+    refresh_token = create_refresh_token(identity=str(user.id))
     
     return jsonify({
         'message': 'Login successful',
@@ -118,12 +145,15 @@ def login():
 def refresh():
     """Refresh access token."""
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_user()
     
     if not user or not user.is_active:
         return jsonify({'error': 'User not found or inactive'}), 401
     
-    new_access_token = create_access_token(identity=current_user_id)
+    new_access_token = create_access_token(
+        identity=current_user_id,
+        additional_claims={'adm': user.is_admin}
+    )
     
     return jsonify({
         'access_token': new_access_token
@@ -133,8 +163,7 @@ def refresh():
 @jwt_required()
 def get_current_user():
     """Get current user information."""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_user()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -151,8 +180,7 @@ def logout():
 @jwt_required()
 def change_password():
     """Change user password."""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = current_user()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -1,11 +1,17 @@
 """
 Main routes for the application.
 """
-from flask import render_template, jsonify, request
+from flask import jsonify, request
 from app.main import main_bp
-from app.models import Post, Tag, User
-from app import db
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.models import Post, Tag
+from app.utils import all_tags
+from sqlalchemy.orm import joinedload, selectinload
+
+def paginate_without_count(query, page, per_page):
+    """Return one page of query and whether another page follows, without a COUNT(*)."""
+    page, per_page = max(page, 1), max(per_page, 1)
+    items = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    return items[:per_page], len(items) > per_page
 
 @main_bp.route('/')
 def index():
@@ -30,14 +36,14 @@ def get_posts():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     
-    posts = Post.query.filter_by(is_published=True)\
-        .order_by(Post.published_at.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    query = Post.query.options(joinedload(Post.author), selectinload(Post.tags))\
+        .filter_by(is_published=True)\
+        .order_by(Post.published_at.desc())
+    posts, has_more = paginate_without_count(query, page, per_page)
     
     return jsonify({
-        'posts': [post.to_dict() for post in posts.items],
-        'total': posts.total,
-        'pages': posts.pages,
+        'posts': [post.to_dict() for post in posts],
+        'has_more': has_more,
         'current_page': page
     })
 
@@ -53,27 +59,34 @@ def get_post(slug):
 @main_bp.route('/tags')
 def get_tags():
     """Get all tags."""
-    tags = Tag.query.all()
-    return jsonify([tag.to_dict() for tag in tags])
+    response = jsonify(all_tags())
+    response.add_etag()
+    return response.make_conditional(request)
 
 @main_bp.route('/tags/<slug>')
 def get_posts_by_tag(slug):
     """Get posts by tag."""
-    tag = Tag.query.filter_by(slug=slug).first()
-    if not tag:
-        return jsonify({'error': 'Tag not found'}), 404
-    
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     
-    posts = tag.posts.filter_by(is_published=True)\
-        .order_by(Post.published_at.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
+    query = Post.query.options(joinedload(Post.author), selectinload(Post.tags))\
+        .filter_by(is_published=True)\
+        .join(Post.tags)\
+        .filter(Tag.slug == slug)\
+        .order_by(Post.published_at.desc())
+    posts, has_more = paginate_without_count(query, page, per_page)
+    
+    # The tag is usually already loaded on a matching post; otherwise query it
+    # (the SQL match may be case-insensitive where Python's == is not)
+    tag = next((tag for tag in posts[0].tags if tag.slug == slug), None) if posts else None
+    if tag is None:
+        tag = Tag.query.filter_by(slug=slug).first()
+    if not tag:
+        return jsonify({'error': 'Tag not found'}), 404
     
     return jsonify({
         'tag': tag.to_dict(),
-        'posts': [post.to_dict() for post in posts.items],
-        'total': posts.total,
-        'pages': posts.pages,
+        'posts': [post.to_dict() for post in posts],
+        'has_more': has_more,
         'current_page': page
     })
@@ -1,17 +1,76 @@
 """
 Database models for the application.
 """
-from datetime import datetime
+from flask import current_app
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_sqlalchemy import SQLAlchemy
+from werkzeug.security import check_password_hash
+from sqlalchemy import event, func, select, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import BINARY, DateTime, TypeDecorator
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 import uuid
 
+# Verification reads the cost parameters from the stored hash itself
+_password_verifier = PasswordHasher()
+
+class utcnow(FunctionElement):
+    """Current UTC timestamp, evaluated by the database."""
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+@compiles(utcnow, 'postgresql')
+def _utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+@compiles(utcnow, 'mysql')
+def _utcnow_mysql(element, compiler, **kw):
+    # CURRENT_TIMESTAMP is session-local time on MySQL; the MySQL DDL compiler
+    # parenthesises this as DEFAULT (UTC_TIMESTAMP()) for server defaults.
+    return 'UTC_TIMESTAMP()'
+
+@compiles(utcnow, 'sqlite')
+def _utcnow_sqlite(element, compiler, **kw):
+    # Match the microsecond format SQLAlchemy binds so stored values sort correctly
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+class UUIDType(TypeDecorator):
+    """UUID column stored as native UUID on PostgreSQL and BINARY(16) elsewhere."""
+    impl = BINARY(16)
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        return dialect.type_descriptor(BINARY(16))
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value if dialect.name == 'postgresql' else value.bytes
+    
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == 'postgresql':
+            return value
+        return uuid.UUID(bytes=value)
+
 class User(db.Model):
     """User model for authentication and user management."""
     __tablename__ = 'users'
+    __table_args__ = (
+        # Keyset pagination: ORDER BY created_at DESC, id DESC
+        db.Index('ix_users_created_id', 'created_at', 'id'),
+    )
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=uuid.uuid4)
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(128))
@@ -19,20 +78,28 @@ class User(db.Model):
     last_name = db.Column(db.String(50))
     is_active = db.Column(db.Boolean, default=True)
     is_admin = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
     last_login = db.Column(db.DateTime)
     
     # Relationships
     posts = db.relationship('Post', backref='author', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Hash and set password."""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set password using the app's PASSWORD_HASH_PARAMS."""
+        hasher = PasswordHasher(**current_app.config['PASSWORD_HASH_PARAMS'])
+        self.password_hash = hasher.hash(password)
     
     def check_password(self, password):
-        """Check password against hash."""
-        return check_password_hash(self.password_hash, password)
+        """Check password against hash, accepting legacy Werkzeug hashes."""
+        if not self.password_hash:
+            return False
+        if not self.password_hash.startswith('$argon2'):
+            return check_password_hash(self.password_hash, password)
+        try:
+            return _password_verifier.verify(self.password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
     
     def to_dict(self):
         """Convert user to dictionary."""
@@ -44,8 +111,8 @@ class User(db.Model):
             'last_name': self.last_name,
             'is_active': self.is_active,
             'is_admin': self.is_admin,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'last_login': self.last_login.isoformat() if self.last_login else None
+            'created_at': self.created_at,
+            'last_login': self.last_login
         }
     
     def __repr__(self):
@@ -54,22 +121,29 @@ class User(db.Model):
 class Post(db.Model):
     """Post model for blog posts or content."""
     __tablename__ = 'posts'
+    __table_args__ = (
+        db.Index('ix_posts_pub_pubat', 'is_published', 'published_at'),
+        db.Index('ix_posts_pub_created_id', 'is_published', 'created_at', 'id'),
+        db.Index('ix_posts_created_id', 'created_at', 'id'),
+    )
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=uuid.uuid4)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
     excerpt = db.Column(db.Text)
     slug = db.Column(db.String(200), unique=True, index=True)
     is_published = db.Column(db.Boolean, default=False)
     published_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Approved comments, maintained by the Comment mapper events below
+    comment_count = db.Column(db.Integer, nullable=False, server_default='0')
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
     
     # Foreign keys
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(UUIDType, db.ForeignKey('users.id'), nullable=False)
     
     # Relationships
-    tags = db.relationship('Tag', secondary='post_tags', backref='posts', lazy='dynamic')
+    tags = db.relationship('Tag', secondary='post_tags', backref='posts', lazy='select')
     comments = db.relationship('Comment', backref='post', lazy='dynamic', cascade='all, delete-orphan')
     
     def to_dict(self):
@@ -81,12 +155,12 @@ class Post(db.Model):
             'excerpt': self.excerpt,
             'slug': self.slug,
             'is_published': self.is_published,
-            'published_at': self.published_at.isoformat() if self.published_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'published_at': self.published_at,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'author': self.author.to_dict() if self.author else None,
             'tags': [tag.to_dict() for tag in self.tags],
-            'comment_count': self.comments.count()
+            'comment_count': self.comment_count
         }
     
     def __repr__(self):
@@ -96,11 +170,11 @@ class Tag(db.Model):
     """Tag model for categorizing posts."""
     __tablename__ = 'tags'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(50), unique=True, nullable=False, index=True)
     slug = db.Column(db.String(50), unique=True, index=True)
     description = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
     
     def to_dict(self):
         """Convert tag to dictionary."""
@@ -109,7 +183,7 @@ class Tag(db.Model):
             'name': self.name,
             'slug': self.slug,
             'description': self.description,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
     
     def __repr__(self):
@@ -118,17 +192,22 @@ class Tag(db.Model):
 class Comment(db.Model):
     """Comment model for post comments."""
     __tablename__ = 'comments'
+    __table_args__ = (
+        db.Index('ix_comments_post_approved_created', 'post_id', 'is_approved', 'created_at'),
+        db.Index('ix_comments_created_id', 'created_at', 'id'),
+    )
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(UUIDType, primary_key=True, default=uuid.uuid4)
     content = db.Column(db.Text, nullable=False)
-    is_approved = db.Column(db.Boolean, default=False)
+    # active_history loads the old value on change so the comment_count events see it
+    is_approved = db.column_property(db.Column(db.Boolean, default=False), active_history=True)
     author_name = db.Column(db.String(100))
     author_email = db.Column(db.String(120))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
     
     # Foreign keys
-    post_id = db.Column(db.String(36), db.ForeignKey('posts.id'), nullable=False)
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'))
+    post_id = db.Column(UUIDType, db.ForeignKey('posts.id'), nullable=False)
+    user_id = db.Column(UUIDType, db.ForeignKey('users.id'))
     
     def to_dict(self):
         """Convert comment to dictionary."""
@@ -138,7 +217,7 @@ class Comment(db.Model):
             'is_approved': self.is_approved,
             'author_name': self.author_name,
             'author_email': self.author_email,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'created_at': self.created_at,
             'post_id': self.post_id,
             'user_id': self.user_id
         }
@@ -146,8 +225,44 @@ class Comment(db.Model):
     def __repr__(self):
         return f'<Comment {self.id}>'
 
+def _adjust_comment_count(connection, post_id, delta):
+    """Add delta to a post's comment_count without loading the post."""
+    posts = Post.__table__
+    connection.execute(
+        update(posts)
+        .where(posts.c.id == post_id)
+        .values(comment_count=posts.c.comment_count + delta)
+    )
+
+@event.listens_for(Comment, 'after_insert')
+def _comment_inserted(mapper, connection, target):
+    if target.is_approved:
+        _adjust_comment_count(connection, target.post_id, 1)
+
+@event.listens_for(Comment, 'after_delete')
+def _comment_deleted(mapper, connection, target):
+    if target.is_approved:
+        _adjust_comment_count(connection, target.post_id, -1)
+
+@event.listens_for(Comment, 'after_update')
+def _comment_updated(mapper, connection, target):
+    history = db.inspect(target).attrs.is_approved.history
+    was_approved = bool(history.deleted and history.deleted[0])
+    if history.has_changes() and bool(target.is_approved) != was_approved:
+        _adjust_comment_count(connection, target.post_id, 1 if target.is_approved else -1)
+
+def recount_comment_counts():
+    """Recompute every post's comment_count from its approved comments."""
+    posts, comments = Post.__table__, Comment.__table__
+    approved = select(func.count()).where(
+        comments.c.post_id == posts.c.id,
+        comments.c.is_approved.is_(True)
+    ).scalar_subquery()
+    db.session.execute(update(posts).values(comment_count=approved))
+    db.session.commit()
+
 # Association table for many-to-many relationship between posts and tags
 post_tags = db.Table('post_tags',
-    db.Column('post_id', db.String(36), db.ForeignKey('posts.id'), primary_key=True),
-    db.Column('tag_id', db.String(36), db.ForeignKey('tags.id'), primary_key=True)
+    db.Column('post_id', UUIDType, db.ForeignKey('posts.id'), primary_key=True),
+    db.Column('tag_id', UUIDType, db.ForeignKey('tags.id'), primary_key=True)
 )
@@ -0,0 +1,35 @@
+"""
+Shared helpers for request handlers.
+"""
+from flask import g
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import get_jwt_identity
+import orjson
+import uuid
+from app import db, cache
+from app.models import Tag, User
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson, serializing datetimes as ISO 8601 UTC."""
+    option = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def current_user():
+    """Return the User for the current JWT identity, loaded at most once per request."""
+    user_id = uuid.UUID(get_jwt_identity())
+    # Keyed on the identity because g outlives a request when an app context
+    # is already active (e.g. the test client inside app.app_context()).
+    if g.get('current_user_id') != user_id:
+        g.current_user = db.session.get(User, user_id)
+        g.current_user_id = user_id
+    return g.current_user
+
+@cache.memoize()
+def all_tags():
+    """Return every tag as a dict; cached until invalidated with delete_memoized."""
+    return [tag.to_dict() for tag in Tag.query.all()]
@@ -12,6 +12,9 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     
+    # Argon2id cost (OWASP baseline: 19 MiB, 2 iterations, 1 lane)
+    PASSWORD_HASH_PARAMS = {'time_cost': 2, 'memory_cost': 19 * 1024, 'parallelism': 1}
+    
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
@@ -19,6 +22,14 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     
+    # Caching (per-process by default; production uses Redis)
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'SimpleCache')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+    CACHE_DEFAULT_TIMEOUT = 300
+    
+    # Write last_login from a background thread instead of the login request
+    DEFER_LAST_LOGIN = True
+    
     # Pagination
     POSTS_PER_PAGE = 20
     
@@ -41,12 +52,36 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or \
         'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    
+    CACHE_TYPE = 'NullCache'
+    CACHE_NO_NULL_WARNING = True
+    DEFER_LAST_LOGIN = False
+    
+    # Cheapest Argon2 parameters; never use outside tests
+    PASSWORD_HASH_PARAMS = {'time_cost': 1, 'memory_cost': 8, 'parallelism': 1}
+    
+    # Pin cheap, offline side effects regardless of the environment
+    JWT_ALGORITHM = 'HS256'
+    MAIL_SUPPRESS_SEND = True
+    SQLALCHEMY_ECHO = False
 
 class ProductionConfig(Config):
     """Production configuration."""
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///prod.db'
     
+    # Connection pool: keep warm connections, drop stale ones before use
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    
+    # Shared cache so every gunicorn worker sees the same tag list and invalidations
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'RedisCache')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    
     @classmethod
     def init_app(cls, app):
         Config.init_app(app)
@@ -2,33 +2,74 @@
 Pytest configuration and fixtures.
 """
 import pytest
-import os
-import tempfile
-from app import create_app, db
+import uuid
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, insert, select
+from app import create_app, db, cache
 from app.models import User, Post, Tag, Comment
 
-@pytest.fixture
-def app():
-    """Create and configure a new app instance for each test."""
-    # Create a temporary file to serve as the database
-    db_fd, db_path = tempfile.mkstemp()
+def pytest_configure(config):
+    """Register custom markers."""
+    config.addinivalue_line(
+        'markers',
+        'slow: hashes or verifies a password per request; cheap under TestingConfig, '
+        'costly only if PASSWORD_HASH_PARAMS is raised to production values'
+    )
+
+class ConnectionBoundSession(Session):
+    """Session that always uses its bind, unlike Flask-SQLAlchemy's engine lookup."""
     
+    def get_bind(self, *args, **kwargs):
+        return self.bind
+
+@pytest.fixture(scope='session')
+def app():
+    """Create the app and its schema once for the whole test run."""
+    # TestingConfig uses in-memory SQLite; Flask-SQLAlchemy gives it a StaticPool
+    # so every connection the app opens shares the one database.
     app = create_app('testing')
-    app.config.update({
-        'TESTING': True,
-        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
-        'WTF_CSRF_ENABLED': False,
-    })
     
     with app.app_context():
         db.create_all()
-        yield app
+    yield app
+    with app.app_context():
         db.drop_all()
+
+@pytest.fixture(autouse=True)
+def db_session(app):
+    """Run each test in its own app context and a transaction rolled back afterwards."""
+    ctx = app.app_context()
+    ctx.push()
+    connection = db.engine.connect()
+    if connection.dialect.name == 'sqlite':
+        # pysqlite defers BEGIN and would let RELEASE of the first SAVEPOINT
+        # commit; take over transaction control so the rollback is real.
+        connection.connection.driver_connection.isolation_level = None
+        event.listen(connection, 'begin', lambda conn: conn.exec_driver_sql('BEGIN'))
+    transaction = connection.begin()
+    
+    # Commits inside the app and tests only release SAVEPOINTs on this connection.
+    # Committed instances stay loaded; refresh() any changed behind the ORM's back
+    # (e.g. Post.comment_count, maintained by raw UPDATEs).
+    original_session = db.session
+    db.session = db._make_scoped_session({
+        'class_': ConnectionBoundSession,
+        'bind': connection,
+        'join_transaction_mode': 'create_savepoint',
+        'expire_on_commit': False
+    })
+    
+    yield db.session
     
-    os.close(db_fd)
-    os.unlink(db_path)
+    db.session.remove()
+    db.session = original_session
+    transaction.rollback()
+    if connection.dialect.name == 'sqlite':
+        connection.connection.driver_connection.isolation_level = ''
+    connection.close()
+    ctx.pop()
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def client(app):
     """A test client for the app."""
     return app.test_client()
@@ -38,20 +79,21 @@ def runner(app):
     """A test runner for the app's Click commands."""
     return app.test_cli_runner()
 
-@pytest.fixture
-def auth_headers(client):
-    """Get authentication headers for testing."""
-    # Create a test user
-    user = User(
-        username='testuser',
-        email='test@example.com',
-        first_name='Test',
-        last_name='User'
-    )
-    user.set_password('testpassword')
-    
-    db.session.add(user)
-    db.session.commit()
+@pytest.fixture(scope='session')
+def auth_headers(app, client):
+    """Get authentication headers for a user created once per test run."""
+    # Committed outside any test transaction, so it survives the per-test rollbacks
+    with app.app_context():
+        user = User(
+            username='testuser',
+            email='test@example.com',
+            first_name='Test',
+            last_name='User'
+        )
+        user.set_password('testpassword')
+        
+        db.session.add(user)
+        db.session.commit()
     
     # Login to get token
     response = client.post('/auth/login', json={
@@ -62,21 +104,21 @@ def auth_headers(client):
     token = response.json['access_token']
     return {'Authorization': f'Bearer {token}'}
 
-@pytest.fixture
-def admin_headers(client):
-    """Get admin authentication headers for testing."""
-    # Create an admin user
-    admin = User(
-        username='admin',
-        email='admin@example.com',
-        first_name='Admin',
-        last_name='User',
-        is_admin=True
-    )
-    admin.set_password('adminpassword')
-    
-    db.session.add(admin)
-    db.session.commit()
+@pytest.fixture(scope='session')
+def admin_headers(app, client):
+    """Get admin authentication headers for a user created once per test run."""
+    with app.app_context():
+        admin = User(
+            username='admin',
+            email='admin@example.com',
+            first_name='Admin',
+            last_name='User',
+            is_admin=True
+        )
+        admin.set_password('adminpassword')
+        
+        db.session.add(admin)
+        db.session.commit()
     
     # Login to get token
     response = client.post('/auth/login', json={
@@ -88,7 +130,34 @@ def admin_headers(client):
     return {'Authorization': f'Bearer {token}'}
 
 @pytest.fixture
-def sample_user():
+def simple_cache(app):
+    """Swap TestingConfig's NullCache for a real in-process cache for one test."""
+    cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
+    yield cache
+    cache.init_app(app)
+
+@pytest.fixture
+def bulk_users(app):
+    """Return a helper that inserts n users in a single executemany INSERT."""
+    def make_users(n, password='bulkpassword'):
+        # Hash once; every seeded user shares the same password
+        template = User()
+        template.set_password(password)
+        rows = [{
+            'id': uuid.uuid4(),
+            'username': f'bulkuser{i}',
+            'email': f'bulkuser{i}@example.com',
+            'password_hash': template.password_hash,
+            'is_active': True,
+            'is_admin': False
+        } for i in range(n)]
+        db.session.execute(insert(User), rows)
+        db.session.commit()
+        return [row['id'] for row in rows]
+    return make_users
+
+@pytest.fixture
+def sample_user(app):
     """Create a sample user for testing."""
     user = User(
         username='sampleuser',
@@ -108,10 +177,27 @@ def sample_post(sample_user):
         excerpt='Test excerpt',
         slug='test-post',
         is_published=True,
-        user_id=sample_user.id
+        author=sample_user
     )
     return post
 
+@pytest.fixture
+def persisted_post(sample_user, sample_post, db_session):
+    """Commit the sample user and post, returning them as a (user, post) tuple."""
+    db_session.add_all([sample_user, sample_post])
+    db_session.commit()
+    return sample_user, sample_post
+
+@pytest.fixture
+def owned_post(auth_headers, sample_post, db_session):
+    """Commit the sample post as owned by the auth_headers user."""
+    sample_post.author = db_session.execute(
+        select(User).filter_by(username='testuser')
+    ).scalar_one()
+    db_session.add(sample_post)
+    db_session.commit()
+    return sample_post
+
 @pytest.fixture
 def sample_tag():
     """Create a sample tag for testing."""
@@ -0,0 +1,25 @@
+"""
+Factories for building test data.
+"""
+import factory
+from app import db
+from app.models import Comment
+
+class CommentFactory(factory.Factory):
+    """Build unsaved Comment instances."""
+    class Meta:
+        model = Comment
+    
+    content = 'Test comment'
+    author_name = 'Test Author'
+    author_email = factory.Sequence(lambda n: f'author{n}@example.com')
+    is_approved = False
+
+def make_comments(n, **kwargs):
+    """Insert n comments with one flush and commit, returning them."""
+    # add_all rather than bulk_save_objects so the comment_count events still fire;
+    # with client-side ids the flush batches the rows into a single INSERT.
+    comments = CommentFactory.build_batch(n, **kwargs)
+    db.session.add_all(comments)
+    db.session.commit()
+    return comments
@@ -3,211 +3,342 @@ Tests for API endpoints.
 """
 import pytest
 import json
-from app.models import User, Post, Tag, Comment
+from sqlalchemy import update
+from app.models import User, Post, Tag
+from tests.factories import make_comments
 
-class TestAPI:
-    """Test API endpoints."""
+# Request bodies serialized once at import rather than on every call
+CREATE_POST_BODY = json.dumps({
+    'title': 'Test Post',
+    'content': 'This is test content.',
+    'excerpt': 'Test excerpt',
+    'is_published': True
+}).encode()
+CREATE_TAG_BODY = json.dumps({
+    'name': 'Test Tag',
+    'description': 'A test tag'
+}).encode()
+CREATE_COMMENT_BODY = json.dumps({
+    'content': 'This is a test comment.',
+    'author_name': 'Test Author',
+    'author_email': 'author@example.com'
+}).encode()
+
+def test_get_posts(client):
+    """Test getting all posts."""
+    response = client.get('/api/v1/posts')
     
-    def test_get_posts(self, client):
-        """Test getting all posts."""
-        response = client.get('/api/v1/posts')
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert 'posts' in data
-        assert 'total' in data
-        assert 'pages' in data
+    assert response.status_code == 200
+    data = response.json
+    assert 'posts' in data
+    assert 'next_cursor' in data
+
+def test_get_posts_cursor_pagination(client, auth_headers):
+    """Test walking through posts with the next_cursor."""
+    for i in range(3):
+        client.post('/api/v1/posts',
+                    headers=auth_headers,
+                    json={
+                        'title': f'Post {i}',
+                        'content': 'This is test content.',
+                        'is_published': True
+                    })
+    
+    response = client.get('/api/v1/posts?per_page=2')
+    first_page = response.json
+    assert len(first_page['posts']) == 2
+    assert first_page['next_cursor']
+    
+    response = client.get(f"/api/v1/posts?per_page=2&cursor={first_page['next_cursor']}")
+    second_page = response.json
+    assert len(second_page['posts']) == 1
+    assert second_page['next_cursor'] is None
+    
+    titles = {post['title'] for post in first_page['posts'] + second_page['posts']}
+    assert titles == {'Post 0', 'Post 1', 'Post 2'}
+
+def test_get_posts_invalid_cursor(client):
+    """Test that a malformed cursor is rejected."""
+    response = client.get('/api/v1/posts?cursor=not-a-cursor')
+    
+    assert response.status_code == 400
+
+def test_get_posts_comment_count(client, auth_headers, admin_headers):
+    """Test that listed posts report their approved comment count."""
+    response = client.post('/api/v1/posts',
+                         headers=auth_headers,
+                         json={
+                             'title': 'Commented Post',
+                             'content': 'This is test content.',
+                             'is_published': True
+                         })
+    post_id = response.json['post']['id']
+    comment_ids = [
+        client.post(f'/api/v1/posts/{post_id}/comments',
+                    json={'content': 'A comment.'}).json['comment']['id']
+        for _ in range(2)
+    ]
+    client.post(f'/api/v1/admin/comments/{comment_ids[0]}/approve',
+                headers=admin_headers)
+    
+    response = client.get('/api/v1/posts')
     
-    def test_create_post(self, client, auth_headers):
-        """Test creating a new post."""
+    assert response.status_code == 200
+    data = response.json
+    assert data['posts'][0]['comment_count'] == 1
+
+def test_create_post(client, auth_headers):
+    """Test creating a new post."""
+    response = client.post('/api/v1/posts',
+                         headers=auth_headers,
+                         data=CREATE_POST_BODY,
+                         content_type='application/json')
+    
+    assert response.status_code == 201
+    data = response.json
+    assert 'message' in data
+    assert 'post' in data
+    assert data['post']['title'] == 'Test Post'
+    assert data['post']['is_published'] == True
+
+def test_create_post_duplicate_slug(client, auth_headers):
+    """Test that posts with the same title get distinct slugs."""
+    slugs = set()
+    for _ in range(2):
         response = client.post('/api/v1/posts',
                              headers=auth_headers,
                              json={
-                                 'title': 'Test Post',
-                                 'content': 'This is test content.',
-                                 'excerpt': 'Test excerpt',
-                                 'is_published': True
-                             })
-        
-        assert response.status_code == 201
-        data = response.get_json()
-        assert 'message' in data
-        assert 'post' in data
-        assert data['post']['title'] == 'Test Post'
-        assert data['post']['is_published'] == True
-    
-    def test_create_post_unauthorized(self, client):
-        """Test creating post without authentication."""
-        response = client.post('/api/v1/posts',
-                             json={
-                                 'title': 'Test Post',
+                                 'title': 'Same Title',
                                  'content': 'This is test content.'
                              })
-        
-        assert response.status_code == 401
-    
-    def test_get_specific_post(self, client, sample_user, sample_post):
-        """Test getting a specific post."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.add(sample_post)
-        db.commit()
-        
-        response = client.get(f'/api/v1/posts/{sample_post.id}')
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert data['title'] == 'Test Post'
-        assert data['content'] == 'This is a test post content.'
-    
-    def test_update_post(self, client, auth_headers, sample_user, sample_post):
-        """Test updating a post."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.add(sample_post)
-        db.commit()
-        
-        # Update the post to belong to the authenticated user
-        sample_post.user_id = sample_user.id
-        db.commit()
-        
-        response = client.put(f'/api/v1/posts/{sample_post.id}',
-                            headers=auth_headers,
-                            json={
-                                'title': 'Updated Post Title',
-                                'content': 'Updated content.'
-                            })
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert data['post']['title'] == 'Updated Post Title'
-        assert data['post']['content'] == 'Updated content.'
-    
-    def test_delete_post(self, client, auth_headers, sample_user, sample_post):
-        """Test deleting a post."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.add(sample_post)
-        db.commit()
-        
-        # Update the post to belong to the authenticated user
-        sample_post.user_id = sample_user.id
-        db.commit()
-        
-        response = client.delete(f'/api/v1/posts/{sample_post.id}',
-                               headers=auth_headers)
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert 'message' in data
-    
-    def test_get_tags(self, client):
-        """Test getting all tags."""
-        response = client.get('/api/v1/tags')
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert isinstance(data, list)
-    
-    def test_create_tag(self, client, auth_headers):
-        """Test creating a new tag."""
-        response = client.post('/api/v1/tags',
-                            headers=auth_headers,
-                            json={
-                                'name': 'Test Tag',
-                                'description': 'A test tag'
-                            })
-        
-        assert response.status_code == 201
-        data = response.get_json()
-        assert 'message' in data
-        assert 'tag' in data
-        assert data['tag']['name'] == 'Test Tag'
-    
-    def test_create_comment(self, client, sample_user, sample_post):
-        """Test creating a comment."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.add(sample_post)
-        db.commit()
-        
-        response = client.post(f'/api/v1/posts/{sample_post.id}/comments',
-                             json={
-                                 'content': 'This is a test comment.',
-                                 'author_name': 'Test Author',
-                                 'author_email': 'author@example.com'
-                             })
-        
         assert response.status_code == 201
-        data = response.get_json()
-        assert 'message' in data
-        assert 'comment' in data
-        assert data['comment']['content'] == 'This is a test comment.'
-    
-    def test_get_post_comments(self, client, sample_user, sample_post):
-        """Test getting comments for a post."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.add(sample_post)
-        db.commit()
-        
-        # Create a comment
-        comment = Comment(
-            content='Test comment',
-            post_id=sample_post.id,
-            author_name='Test Author',
-            is_approved=True
-        )
-        db.add(comment)
-        db.commit()
-        
-        response = client.get(f'/api/v1/posts/{sample_post.id}/comments')
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert isinstance(data, list)
-        assert len(data) == 1
-        assert data[0]['content'] == 'Test comment'
-    
-    def test_admin_get_users(self, client, admin_headers):
-        """Test admin getting all users."""
-        response = client.get('/api/v1/admin/users', headers=admin_headers)
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert 'users' in data
-        assert 'total' in data
-    
-    def test_admin_get_users_unauthorized(self, client, auth_headers):
-        """Test non-admin trying to get all users."""
-        response = client.get('/api/v1/admin/users', headers=auth_headers)
-        
-        assert response.status_code == 403
-    
-    def test_admin_approve_comment(self, client, admin_headers, sample_user, sample_post):
-        """Test admin approving a comment."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.add(sample_post)
-        db.commit()
-        
-        # Create a comment
-        comment = Comment(
-            content='Test comment',
-            post_id=sample_post.id,
-            author_name='Test Author',
-            is_approved=False
-        )
-        db.add(comment)
-        db.commit()
-        
-        response = client.post(f'/api/v1/admin/comments/{comment.id}/approve',
-                            headers=admin_headers)
-        
+        slugs.add(response.json['post']['slug'])
+    
+    assert len(slugs) == 2
+    assert 'same-title' in slugs
+
+@pytest.mark.parametrize('title,slug', [
+    ('Café Crème', 'café-crème'),
+    ('Привет мир', 'привет-мир'),
+])
+def test_create_post_non_ascii_slug(client, auth_headers, title, slug):
+    """Test that slugs keep non-ASCII letters."""
+    response = client.post('/api/v1/posts',
+                         headers=auth_headers,
+                         json={'title': title, 'content': 'This is test content.'})
+    
+    assert response.status_code == 201
+    assert response.json['post']['slug'] == slug
+
+def test_create_post_symbol_only_slug(client, auth_headers):
+    """Test that a title with no letters or digits still gets a slug."""
+    response = client.post('/api/v1/posts',
+                         headers=auth_headers,
+                         json={'title': '!!!', 'content': 'This is test content.'})
+    
+    assert response.status_code == 201
+    assert response.json['post']['slug']
+
+def test_create_post_unauthorized(client):
+    """Test creating post without authentication."""
+    response = client.post('/api/v1/posts',
+                         json={
+                             'title': 'Test Post',
+                             'content': 'This is test content.'
+                         })
+    
+    assert response.status_code == 401
+
+def test_get_specific_post(client, persisted_post):
+    """Test getting a specific post."""
+    user, post = persisted_post
+    
+    response = client.get(f'/api/v1/posts/{post.id}')
+    
+    assert response.status_code == 200
+    data = response.json
+    assert data['title'] == 'Test Post'
+    assert data['content'] == 'This is a test post content.'
+
+def test_update_post(client, auth_headers, owned_post):
+    """Test updating a post."""
+    response = client.put(f'/api/v1/posts/{owned_post.id}',
+                        headers=auth_headers,
+                        json={
+                            'title': 'Updated Post Title',
+                            'content': 'Updated content.'
+                        })
+    
+    assert response.status_code == 200
+    data = response.json
+    assert data['post']['title'] == 'Updated Post Title'
+    assert data['post']['content'] == 'Updated content.'
+
+def test_delete_post(client, auth_headers, owned_post):
+    """Test deleting a post."""
+    response = client.delete(f'/api/v1/posts/{owned_post.id}',
+                           headers=auth_headers)
+    
+    assert response.status_code == 200
+    data = response.json
+    assert 'message' in data
+
+def test_get_tags(client):
+    """Test getting all tags."""
+    response = client.get('/api/v1/tags')
+    
+    assert response.status_code == 200
+    data = response.json
+    assert isinstance(data, list)
+
+def test_get_tags_not_modified(client):
+    """Test that tags are served with an ETag and honour If-None-Match."""
+    response = client.get('/api/v1/tags')
+    etag = response.headers['ETag']
+    
+    response = client.get('/api/v1/tags', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 304
+
+def test_create_tag_invalidates_cached_tags(client, auth_headers, simple_cache):
+    """Test that creating a tag evicts the memoized tag list."""
+    response = client.get('/api/v1/tags')
+    assert response.json == []
+    etag = response.headers['ETag']
+    
+    response = client.post('/api/v1/tags',
+                        headers=auth_headers,
+                        data=CREATE_TAG_BODY,
+                        content_type='application/json')
+    assert response.status_code == 201
+    
+    response = client.get('/api/v1/tags', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [tag['name'] for tag in response.json] == ['Test Tag']
+
+def test_create_tag(client, auth_headers):
+    """Test creating a new tag."""
+    response = client.post('/api/v1/tags',
+                        headers=auth_headers,
+                        data=CREATE_TAG_BODY,
+                        content_type='application/json')
+    
+    assert response.status_code == 201
+    data = response.json
+    assert 'message' in data
+    assert 'tag' in data
+    assert data['tag']['name'] == 'Test Tag'
+
+def test_create_comment(client, persisted_post):
+    """Test creating a comment."""
+    user, post = persisted_post
+    
+    response = client.post(f'/api/v1/posts/{post.id}/comments',
+                         data=CREATE_COMMENT_BODY,
+                         content_type='application/json')
+    
+    assert response.status_code == 201
+    data = response.json
+    assert 'message' in data
+    assert 'comment' in data
+    assert data['comment']['content'] == 'This is a test comment.'
+
+def test_get_post_comments(client, persisted_post):
+    """Test getting comments for a post."""
+    user, post = persisted_post
+    make_comments(1, post_id=post.id, is_approved=True)
+    
+    response = client.get(f'/api/v1/posts/{post.id}/comments')
+    
+    assert response.status_code == 200
+    data = response.json
+    assert isinstance(data, list)
+    assert len(data) == 1
+    assert data[0]['content'] == 'Test comment'
+
+@pytest.mark.parametrize('is_approved,expected', [(False, 0), (True, 1)])
+def test_comment_count_tracks_expired_approval(persisted_post, db_session, is_approved, expected):
+    """Test that changing is_approved on an expired comment updates comment_count."""
+    user, post = persisted_post
+    comment, = make_comments(1, post_id=post.id, is_approved=True)
+    
+    db_session.expire(comment)
+    comment.is_approved = is_approved
+    db_session.commit()
+    
+    db_session.refresh(post)
+    assert post.comment_count == expected
+
+def test_comment_count_after_delete(persisted_post, db_session):
+    """Test that deleting an approved comment decrements comment_count."""
+    user, post = persisted_post
+    comment, = make_comments(1, post_id=post.id, is_approved=True)
+    
+    db_session.expire(comment)
+    db_session.delete(comment)
+    db_session.commit()
+    
+    db_session.refresh(post)
+    assert post.comment_count == 0
+
+def test_recount_comments_command(runner, persisted_post, db_session):
+    """Test that the recount-comments command backfills comment_count."""
+    user, post = persisted_post
+    make_comments(2, post_id=post.id, is_approved=True)
+    make_comments(1, post_id=post.id, is_approved=False)
+    db_session.execute(update(Post).values(comment_count=0))
+    
+    result = runner.invoke(args=['recount-comments'])
+    
+    assert result.exit_code == 0
+    db_session.refresh(post)
+    assert post.comment_count == 2
+
+def test_admin_get_users(client, admin_headers):
+    """Test admin getting all users."""
+    response = client.get('/api/v1/admin/users', headers=admin_headers)
+    
+    assert response.status_code == 200
+    data = response.json
+    assert 'users' in data
+    assert 'next_cursor' in data
+
+def test_admin_get_users_cursor_pagination(client, admin_headers, bulk_users):
+    """Test paging through a large user table with cursors."""
+    seeded = bulk_users(25)
+    
+    seen = []
+    url = '/api/v1/admin/users?per_page=10'
+    while url:
+        response = client.get(url, headers=admin_headers)
         assert response.status_code == 200
-        data = response.get_json()
-        assert 'message' in data
-        
-        # Verify comment is approved
-        updated_comment = Comment.query.get(comment.id)
-        assert updated_comment.is_approved == True
+        data = response.json
+        seen.extend(user['id'] for user in data['users'])
+        cursor = data['next_cursor']
+        url = f'/api/v1/admin/users?per_page=10&cursor={cursor}' if cursor else None
+    
+    # Every user, including the shared fixture users, returned exactly once
+    assert len(seen) == len(set(seen)) == User.query.count()
+    assert {str(user_id) for user_id in seeded} <= set(seen)
+
+def test_admin_get_users_unauthorized(client, auth_headers):
+    """Test non-admin trying to get all users."""
+    response = client.get('/api/v1/admin/users', headers=auth_headers)
+    
+    assert response.status_code == 403
+
+def test_admin_approve_comment(client, admin_headers, persisted_post, db_session):
+    """Test admin approving a comment."""
+    user, post = persisted_post
+    comment, = make_comments(1, post_id=post.id, is_approved=False)
+    
+    response = client.post(f'/api/v1/admin/comments/{comment.id}/approve',
+                        headers=admin_headers)
+    
+    assert response.status_code == 200
+    data = response.json
+    assert 'message' in data
+    
+    # Verify comment is approved
+    db_session.refresh(comment)
+    assert comment.is_approved is True
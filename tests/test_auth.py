@@ -3,167 +3,187 @@ Tests for authentication functionality.
 """
 import pytest
 import json
+from sqlalchemy import select
+from werkzeug.security import generate_password_hash
 from app.models import User
 
-class TestAuth:
-    """Test authentication endpoints."""
-    
-    def test_register_success(self, client):
-        """Test successful user registration."""
-        response = client.post('/auth/register', json={
-            'username': 'newuser',
-            'email': 'newuser@example.com',
-            'password': 'newpassword',
-            'first_name': 'New',
-            'last_name': 'User'
-        })
-        
-        assert response.status_code == 201
-        data = response.get_json()
-        assert 'message' in data
-        assert 'user' in data
-        assert 'access_token' in data
-        assert 'refresh_token' in data
-        assert data['user']['username'] == 'newuser'
-        assert data['user']['email'] == 'newuser@example.com'
-    
-    def test_register_missing_fields(self, client):
-        """Test registration with missing fields."""
-        response = client.post('/auth/register', json={
-            'username': 'newuser',
-            'email': 'newuser@example.com'
-            # Missing password
-        })
-        
-        assert response.status_code == 400
-        data = response.get_json()
-        assert 'error' in data
-    
-    def test_register_duplicate_username(self, client, sample_user):
-        """Test registration with duplicate username."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.commit()
-        
-        response = client.post('/auth/register', json={
-            'username': 'sampleuser',  # Duplicate username
-            'email': 'different@example.com',
-            'password': 'password'
-        })
-        
-        assert response.status_code == 400
-        data = response.get_json()
-        assert 'error' in data
-        assert 'Username already exists' in data['error']
-    
-    def test_register_duplicate_email(self, client, sample_user):
-        """Test registration with duplicate email."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.commit()
-        
-        response = client.post('/auth/register', json={
-            'username': 'differentuser',
-            'email': 'sample@example.com',  # Duplicate email
-            'password': 'password'
-        })
-        
-        assert response.status_code == 400
-        data = response.get_json()
-        assert 'error' in data
-        assert 'Email already exists' in data['error']
-    
-    def test_login_success(self, client, sample_user):
-        """Test successful login."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.commit()
-        
-        response = client.post('/auth/login', json={
-            'username_or_email': 'sampleuser',
-            'password': 'samplepassword'
-        })
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert 'access_token' in data
-        assert 'refresh_token' in data
-        assert 'user' in data
-        assert data['user']['username'] == 'sampleuser'
-    
-    def test_login_with_email(self, client, sample_user):
-        """Test login with email instead of username."""
-        db = sample_user._sa_instance_state.session
-        db.add(sample_user)
-        db.commit()
-        
-        response = client.post('/auth/login', json={
-            'username_or_email': 'sample@example.com',
-            'password': 'samplepassword'
-        })
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert 'access_token' in data
-    
-    def test_login_invalid_credentials(self, client):
-        """Test login with invalid credentials."""
-        response = client.post('/auth/login', json={
-            'username_or_email': 'nonexistent',
-            'password': 'wrongpassword'
-        })
-        
-        assert response.status_code == 401
-        data = response.get_json()
-        assert 'error' in data
-        assert 'Invalid credentials' in data['error']
-    
-    def test_get_current_user(self, client, auth_headers):
-        """Test getting current user information."""
-        response = client.get('/auth/me', headers=auth_headers)
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert data['username'] == 'testuser'
-        assert data['email'] == 'test@example.com'
-    
-    def test_get_current_user_unauthorized(self, client):
-        """Test getting current user without authentication."""
-        response = client.get('/auth/me')
-        
-        assert response.status_code == 401
-    
-    def test_change_password(self, client, auth_headers):
-        """Test changing password."""
-        response = client.post('/auth/change-password', 
-                             headers=auth_headers,
-                             json={
-                                 'current_password': 'testpassword',
-                                 'new_password': 'newpassword123'
-                             })
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert 'message' in data
-    
-    def test_change_password_wrong_current(self, client, auth_headers):
-        """Test changing password with wrong current password."""
-        response = client.post('/auth/change-password',
-                             headers=auth_headers,
-                             json={
-                                 'current_password': 'wrongpassword',
-                                 'new_password': 'newpassword123'
-                             })
-        
-        assert response.status_code == 400
-        data = response.get_json()
-        assert 'error' in data
-        assert 'Current password is incorrect' in data['error']
-    
-    def test_logout(self, client, auth_headers):
-        """Test logout."""
-        response = client.post('/auth/logout', headers=auth_headers)
-        
-        assert response.status_code == 200
-        data = response.get_json()
-        assert 'message' in data
+# Request bodies serialized once at import rather than on every call
+REGISTER_BODY = json.dumps({
+    'username': 'newuser',
+    'email': 'newuser@example.com',
+    'password': 'newpassword',
+    'first_name': 'New',
+    'last_name': 'User'
+}).encode()
+LOGIN_BODIES = {
+    username_or_email: json.dumps({
+        'username_or_email': username_or_email,
+        'password': 'samplepassword'
+    }).encode()
+    for username_or_email in ('sampleuser', 'sample@example.com')
+}
+CHANGE_PASSWORD_BODY = json.dumps({
+    'current_password': 'testpassword',
+    'new_password': 'newpassword123'
+}).encode()
+CHANGE_PASSWORD_WRONG_BODY = json.dumps({
+    'current_password': 'wrongpassword',
+    'new_password': 'newpassword123'
+}).encode()
+
+@pytest.mark.slow
+def test_register_success(client):
+    """Test successful user registration."""
+    response = client.post('/auth/register', data=REGISTER_BODY,
+                           content_type='application/json')
+    
+    assert response.status_code == 201
+    data = response.json
+    assert 'message' in data
+    assert 'user' in data
+    assert 'access_token' in data
+    assert 'refresh_token' in data
+    assert data['user']['username'] == 'newuser'
+    assert data['user']['email'] == 'newuser@example.com'
+
+def test_register_missing_fields(client):
+    """Test registration with missing fields."""
+    response = client.post('/auth/register', json={
+        'username': 'newuser',
+        'email': 'newuser@example.com'
+        # Missing password
+    })
+    
+    assert response.status_code == 400
+    data = response.json
+    assert 'error' in data
+
+@pytest.mark.parametrize('body,error', [
+    (json.dumps({'username': 'sampleuser', 'email': 'different@example.com',
+                 'password': 'password'}).encode(), 'Username already exists'),
+    (json.dumps({'username': 'differentuser', 'email': 'sample@example.com',
+                 'password': 'password'}).encode(), 'Email already exists'),
+], ids=['username', 'email'])
+def test_register_duplicate(client, db_session, sample_user, body, error):
+    """Test registration with a duplicate username or email."""
+    db_session.add(sample_user)
+    db_session.commit()
+    
+    response = client.post('/auth/register', data=body,
+                           content_type='application/json')
+    
+    assert response.status_code == 400
+    data = response.json
+    assert 'error' in data
+    assert error in data['error']
+
+@pytest.mark.slow
+@pytest.mark.parametrize('body', LOGIN_BODIES.values(), ids=LOGIN_BODIES.keys())
+def test_login_success(client, db_session, sample_user, body):
+    """Test successful login by username or by email."""
+    db_session.add(sample_user)
+    db_session.commit()
+    
+    response = client.post('/auth/login', data=body,
+                           content_type='application/json')
+    
+    assert response.status_code == 200
+    data = response.json
+    assert 'access_token' in data
+    assert 'refresh_token' in data
+    assert 'user' in data
+    assert data['user']['username'] == 'sampleuser'
+
+@pytest.mark.slow
+def test_login_records_last_login(client, db_session, sample_user):
+    """Test that a successful login persists last_login."""
+    db_session.add(sample_user)
+    db_session.commit()
+    assert sample_user.last_login is None
+    
+    response = client.post('/auth/login', data=LOGIN_BODIES['sampleuser'],
+                           content_type='application/json')
+    assert response.status_code == 200
+    
+    # Discard in-memory state and read the stored row
+    db_session.expire_all()
+    last_login = db_session.execute(
+        select(User.last_login).filter_by(id=sample_user.id)
+    ).scalar_one()
+    assert last_login is not None
+
+@pytest.mark.slow
+@pytest.mark.parametrize('password,status', [('legacypassword', 200), ('wrongpassword', 401)])
+def test_login_legacy_password_hash(client, db_session, sample_user, password, status):
+    """Test that users with pre-Argon2 Werkzeug hashes can still log in."""
+    # One PBKDF2 round keeps it cheap while still going through check_password_hash
+    sample_user.password_hash = generate_password_hash('legacypassword', method='pbkdf2:sha256:1')
+    db_session.add(sample_user)
+    db_session.commit()
+    
+    response = client.post('/auth/login', json={
+        'username_or_email': 'sampleuser',
+        'password': password
+    })
+    
+    assert response.status_code == status
+
+def test_login_invalid_credentials(client):
+    """Test login with invalid credentials."""
+    response = client.post('/auth/login', json={
+        'username_or_email': 'nonexistent',
+        'password': 'wrongpassword'
+    })
+    
+    assert response.status_code == 401
+    data = response.json
+    assert 'error' in data
+    assert 'Invalid credentials' in data['error']
+
+def test_get_current_user(client, auth_headers):
+    """Test getting current user information."""
+    response = client.get('/auth/me', headers=auth_headers)
+    
+    assert response.status_code == 200
+    data = response.json
+    assert data['username'] == 'testuser'
+    assert data['email'] == 'test@example.com'
+
+def test_get_current_user_unauthorized(client):
+    """Test getting current user without authentication."""
+    response = client.get('/auth/me')
+    
+    assert response.status_code == 401
+
+@pytest.mark.slow
+def test_change_password(client, auth_headers):
+    """Test changing password."""
+    response = client.post('/auth/change-password', 
+                         headers=auth_headers,
+                         data=CHANGE_PASSWORD_BODY,
+                         content_type='application/json')
+    
+    assert response.status_code == 200
+    data = response.json
+    assert 'message' in data
+
+@pytest.mark.slow
+def test_change_password_wrong_current(client, auth_headers):
+    """Test changing password with wrong current password."""
+    response = client.post('/auth/change-password',
+                         headers=auth_headers,
+                         data=CHANGE_PASSWORD_WRONG_BODY,
+                         content_type='application/json')
+    
+    assert response.status_code == 400
+    data = response.json
+    assert 'error' in data
+    assert 'Current password is incorrect' in data['error']
+
+def test_logout(client, auth_headers):
+    """Test logout."""
+    response = client.post('/auth/logout', headers=auth_headers)
+    
+    assert response.status_code == 200
+    data = response.json
+    assert 'message' in data
@@ -0,0 +1,67 @@
+"""
+Tests for the public main blueprint.
+"""
+from app.models import Post
+
+def make_posts(db_session, author, n, tags=()):
+    """Commit n published posts by author, optionally tagged."""
+    posts = [
+        Post(
+            title=f'Post {i}',
+            content='This is test content.',
+            slug=f'post-{i}',
+            is_published=True,
+            author=author,
+            tags=list(tags)
+        )
+        for i in range(n)
+    ]
+    db_session.add_all(posts)
+    db_session.commit()
+    return posts
+
+def test_get_posts_has_more(client, db_session, sample_user):
+    """Test that has_more reports whether another page follows."""
+    make_posts(db_session, sample_user, 3)
+    
+    response = client.get('/posts?per_page=2')
+    assert response.status_code == 200
+    data = response.json
+    assert len(data['posts']) == 2
+    assert data['has_more'] is True
+    
+    response = client.get('/posts?per_page=2&page=2')
+    data = response.json
+    assert len(data['posts']) == 1
+    assert data['has_more'] is False
+
+def test_get_posts_by_tag(client, db_session, sample_user, sample_tag):
+    """Test listing the posts for a tag."""
+    make_posts(db_session, sample_user, 2, tags=[sample_tag])
+    
+    response = client.get('/tags/test-tag')
+    
+    assert response.status_code == 200
+    data = response.json
+    assert data['tag']['slug'] == 'test-tag'
+    assert len(data['posts']) == 2
+    assert data['has_more'] is False
+
+def test_get_posts_by_tag_without_posts(client, db_session, sample_tag):
+    """Test that a tag with no posts returns an empty list."""
+    db_session.add(sample_tag)
+    db_session.commit()
+    
+    response = client.get('/tags/test-tag')
+    
+    assert response.status_code == 200
+    data = response.json
+    assert data['tag']['slug'] == 'test-tag'
+    assert data['posts'] == []
+    assert data['has_more'] is False
+
+def test_get_posts_by_unknown_tag(client):
+    """Test that an unknown tag returns 404."""
+    response = client.get('/tags/no-such-tag')
+    
+    assert response.status_code == 404